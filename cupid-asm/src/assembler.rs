@@ -17,51 +17,22 @@ macro_rules! def_opcode {
     ($self:ident, $mme:ident, $opcode:expr, $operand_count:expr) => {
         $self
             .opcode_table
-            .push((stringify!($mme).to_string(), ($opcode, $operand_count)));
+            .insert($opcode, (stringify!($mme), $operand_count));
     };
     ($self:ident, $mme:ident, $opcode:expr, $operand_count:expr, $desc:expr) => {
         $self
             .opcode_table
-            .push((stringify!($mme).to_string(), ($opcode, $operand_count)));
-    };
-}
-
-macro_rules! find_opcode {
-    ($self:ident, $mme:expr) => {
-        $self
-            .opcode_table
-            .iter()
-            .find(|(name, _)| name == $mme)
-            .map(|(_, (opcode, operand_count))| (*opcode, *operand_count))
-    };
-
-    ($self:ident, $opcode:expr, opcode) => {
-        $self
-            .opcode_table
-            .iter()
-            .find(|(_, (code, _))| *code == $opcode)
-            .map(|(name, (_, operand_count))| (name.clone(), *operand_count))
-    };
-}
-
-macro_rules! find_opcode_size {
-    ($self:ident, $mme:expr) => {
-        $self
-            .opcode_table
-            .iter()
-            .find(|(name, _)| name == $mme)
-            .map(|(_, (_, size))| *size)
-            .unwrap_or(0)
+            .insert($opcode, (stringify!($mme), $operand_count));
     };
 }
 
 #[derive(Debug, Clone)]
 pub struct Assembler {
-    pub ast: Ast,   // maybe make this a Rc type, so we dont need to '.clone' as much?
     pub ptr: usize, // current position, translates to ip
 
-    // Store the operands in a table along with their description
-    opcode_table: Vec<(String, (u8, usize))>, // opcode, operand count
+    // Opcode -> (mnemonic, operand count), hashed for O(1) lookups in the
+    // emission loop instead of a linear scan per instruction
+    opcode_table: HashMap<u8, (&'static str, usize)>,
     
     buffer: Vec<u8>,
     root_path: PathBuf,
@@ -70,6 +41,10 @@ pub struct Assembler {
     pub labels: HashMap<String, usize>,
     pub consts: HashMap<String, Node>,
 
+    // Forward label references: (buffer offset, label name) pairs that
+    // get patched once the label's address is known
+    patches: Vec<(usize, String)>,
+
     // Output bytecode
     pub output_bc: Vec<u8>,
 }
@@ -77,14 +52,14 @@ pub struct Assembler {
 impl Assembler {
     pub fn new(root_path: &Path) -> Self {
         Self {
-            ast: Vec::new(),
             ptr: 0,
             labels: HashMap::new(),
             consts: HashMap::new(),
+            patches: Vec::new(),
             output_bc: Vec::new(),
             buffer: Vec::new(),
             root_path: root_path.into(),
-            opcode_table: Vec::new(),
+            opcode_table: HashMap::new(),
         }
     }
 
@@ -119,63 +94,6 @@ impl Assembler {
         def_opcode!(self, halt,     0xFF,   0,           "halt execution");
     }
 
-    fn count_size(&self, value: &Node) -> usize {
-        match value {
-            Node::Str(s) => s.len() + 1, // String bytes + null terminator
-            Node::Int(value) => {
-                if *value <= 0xFF {
-                    1 // u8
-                } else if *value <= 0xFFFF {
-                    2 // u16
-                } else {
-                    4 // u32
-                }
-            }
-            Node::ByteSeq(bytes) => bytes.len(),
-            Node::Ident(ident) => ident.len(),
-
-            _ => 0,
-        }
-    }
-
-    fn calculate_instruction_size(&self, instr: &Instr, args: &[Node]) -> Result<usize, String> {
-        let mut size = 1;
-        let jumps = matches!(
-            *instr,
-            Instr::JABS | Instr::JREL | Instr::JEQ | Instr::JNE | Instr::CALL
-        );
-
-        size += match *instr {
-            _instr if jumps => 4, // 4 byte address
-
-            Instr::PUSHSZ => {
-                if let Some(Node::Str(s)) = args.first() {
-                    s.len() + 1 // String bytes + null terminator
-                } else if let Some(arg) = args.first() {
-                    self.count_size(arg)
-                } else {
-                    return Err("PUSHSZ expects a string argument".into());
-                }
-            }
-
-            Instr::PUSH8 => find_opcode!(self, "push8")
-                .map(|(_, size)| size)
-                .unwrap_or(1), // Default to 1 if not found
-
-            Instr::PUSH16 => find_opcode!(self, "push16")
-                .map(|(_, size)| size)
-                .unwrap_or(2), // Default to 2 if not found
-
-            Instr::PUSH32 => find_opcode!(self, "push32")
-                .map(|(_, size)| size)
-                .unwrap_or(4), // Default to 4 if not found
-
-            _ => self.operand_count(*instr as u8),
-        };
-
-        Ok(size)
-    }
-
     // --------------------------------------
     // Instruction encoding
     // --------------------------------------
@@ -206,6 +124,34 @@ impl Assembler {
         self.ptr += 4; // Addresses are 4 bytes
     }
 
+    // C style #include, very dumb
+    fn parse_include(&self, path: &str) -> Result<Ast, String> {
+        let full_path = self.root_path.join(path);
+
+        let contents = std::fs::read_to_string(full_path).map_err(|e| e.to_string())?;
+        let mut lexer = crate::lexer::Lexer::new(&contents);
+        let mut tokens = lexer.lex();
+        let mut parser = crate::parser::Parser::new(&mut tokens, &contents);
+
+        parser.parse().map_err(|e| e.to_string())
+    }
+
+    // Splice %include'd files into the AST up front, so the emission pass
+    // (and the const pass before it) iterate one flat node list instead of
+    // re-entering the assembler per included file
+    fn expand_includes(&self, ast: &Ast) -> Result<Ast, String> {
+        let mut expanded = Vec::with_capacity(ast.len());
+        for node in ast {
+            if let Node::Directive(Directive::Include(path)) = node {
+                let included = self.parse_include(path)?;
+                expanded.extend(self.expand_includes(&included)?);
+            } else {
+                expanded.push(node.clone());
+            }
+        }
+        Ok(expanded)
+    }
+
     fn encode_operand(&mut self, arg: &Node) -> Result<usize, String> {
         match arg {
             Node::Ident(label) => {
@@ -217,7 +163,11 @@ impl Assembler {
                     let const_value = const_value.clone();
                     self.encode_operand(&const_value)
                 } else {
-                    Err(format!("Undefined label or constant: {}", label))
+                    // Forward reference: emit a placeholder address and
+                    // patch it once the label has been defined
+                    self.patches.push((self.buffer.len(), label.clone()));
+                    self.encode_address_operand(0);
+                    Ok(0)
                 }
             }
             Node::Int(value) => {
@@ -244,39 +194,22 @@ impl Assembler {
 
     // Copy and paste from src/runtime/machine.rs
     fn operand_count(&self, instr: u8) -> usize {
-        find_opcode!(self, instr, opcode)
-            .map(|(_, count)| count)
+        self.opcode_table
+            .get(&instr)
+            .map(|(_, count)| *count)
             .unwrap_or(0)
     }
 
-    // Helper function to push either an u8, u16 or u32.
-    // We need to check and increment ptr by the appropriate amount
-    fn push_sized_int(&mut self, value: u32, size: usize) {
-        if size == 1 {
-            // u8
-            self.buffer.push(value as u8);
-            self.ptr += 1;
-        } else if size == 2 {
-            // u16
-            self.buffer.extend_from_slice(&(value as u16).to_le_bytes());
-            self.ptr += 2;
-        } else {
-            // u32
-            self.buffer.extend_from_slice(&value.to_le_bytes());
-            self.ptr += 4;
-        }
-    }
-
     fn visit_push_int(
         &mut self,
         size: usize,
         instr: &Instr,
-        args: Vec<Node>,
+        args: &[Node],
     ) -> Result<(), String> {
         match args.first() {
             Some(node) => match node {
                 Node::Int(value) => {
-                    self.push_sized_int(*value, size);
+                    self.encode_int_operand(*value, size);
                     Ok(())
                 }
 
@@ -287,7 +220,7 @@ impl Assembler {
                         .cloned()
                         .ok_or(format!("Undefined constant: {}", label))?;
                     if let Node::Int(value) = const_value {
-                        self.push_sized_int(value, size);
+                        self.encode_int_operand(value, size);
                         Ok(())
                     } else {
                         Err(format!("{:?} expects an integer operand", instr))
@@ -312,36 +245,47 @@ impl Assembler {
             }
 
             Directive::Include(path) => {
-                let full_path = self.root_path.join(path);
-
-                // C style #include, very dumb
-                let contents = std::fs::read_to_string(full_path).map_err(|e| e.to_string())?;
-                let mut lexer = crate::lexer::Lexer::new(&contents);
-                let mut tokens = lexer.lex();
-                let mut parser = crate::parser::Parser::new(&mut tokens, &contents);
-
-                let ast = parser.parse().map_err(|e| e.to_string())?;
+                // Normally spliced into the AST before emission; this only
+                // triggers for includes nested somewhere expand_includes
+                // does not reach (e.g. inside a %rep body)
+                let ast = self.parse_include(path)?;
                 for node in ast {
                     self.visit_node(&node)?;
                 }
             }
 
             Directive::Stringz(string) => {
-                self.buffer.extend_from_slice(string.as_bytes());
-                self.buffer.push(0); // Null terminator
-                self.ptr += string.len() + 1;
+                self.encode_string_operand(string);
             }
 
             Directive::ByteSeq(bytes) => {
-                self.buffer.extend_from_slice(bytes);
-                self.ptr += bytes.len();
+                self.encode_byte_seq_operand(bytes);
             }
 
             Directive::Rep(count, body) => {
-                for _ in 0..*count {
+                // Encode the body once and replicate the emitted bytes,
+                // instead of re-walking the AST for every iteration
+                if *count > 0 {
+                    let start = self.buffer.len();
+                    let patches_start = self.patches.len();
+
                     for node in body {
                         self.visit_node(node)?;
                     }
+
+                    let chunk_len = self.buffer.len() - start;
+                    let body_patches = self.patches[patches_start..].to_vec();
+
+                    for i in 1..*count as usize {
+                        self.buffer.extend_from_within(start..start + chunk_len);
+                        self.ptr += chunk_len;
+
+                        // Forward references in the body get patched in
+                        // every copy, not just the first
+                        for (offset, label) in &body_patches {
+                            self.patches.push((offset + i * chunk_len, label.clone()));
+                        }
+                    }
                 }
             }
         }
@@ -349,7 +293,7 @@ impl Assembler {
         Ok(())
     }
 
-    fn visit_instruction(&mut self, instr: &Instr, args: Vec<Node>) -> Result<(), String> {
+    fn visit_instruction(&mut self, instr: &Instr, args: &[Node]) -> Result<(), String> {
         self.buffer.push(*instr as u8);
         self.ptr += 1;
 
@@ -369,9 +313,7 @@ impl Assembler {
 
             Instr::PUSHSZ => {
                 if let Some(Node::Str(s)) = args.first() {
-                    self.buffer.extend_from_slice(s.as_bytes());
-                    self.buffer.push(0);
-                    self.ptr += s.len() + 1;
+                    self.encode_string_operand(s);
                 } else if let Some(arg) = args.first() {
                     self.encode_operand(arg)?;
                 }
@@ -382,17 +324,18 @@ impl Assembler {
             }
 
             _ => {
-                if args.len() != self.operand_count(*instr as u8) {
+                let count = self.operand_count(*instr as u8);
+                if args.len() != count {
                     return Err(format!(
                         "Instruction {:?} expects {} operands, got {}",
                         instr,
-                        self.operand_count(*instr as u8),
+                        count,
                         args.len()
                     ));
                 }
 
-                for i in 0..self.operand_count(*instr as u8) {
-                    self.encode_operand(&args[i])?;
+                for arg in &args[..count] {
+                    self.encode_operand(arg)?;
                 }
             }
         }
@@ -400,20 +343,22 @@ impl Assembler {
         Ok(())
     }
 
-    fn visit_label(&mut self, _label: &str) -> Result<(), String> {
-        // Don't do anything - we resolved at the first pass
+    fn visit_label(&mut self, label: &str) -> Result<(), String> {
+        // Labels are learned inline as we emit; earlier references are
+        // back-patched at the end of the pass
+        self.labels.insert(label.to_string(), self.ptr);
+        crate::debug_log!("assembler: Defined label {} at {:08X}", label, self.ptr);
         Ok(())
     }
 
     fn visit_node(&mut self, node: &Node) -> Result<(), String> {
         match node {
             Node::Directive(dir) => self.visit_directive(dir),
-            Node::Instruction(instr, args) => self.visit_instruction(&instr, args.clone()),
+            Node::Instruction(instr, args) => self.visit_instruction(instr, args),
             Node::Label(label) => self.visit_label(label),
 
             Node::ByteSeq(bytes) => {
-                self.buffer.extend_from_slice(bytes);
-                self.ptr += bytes.len();
+                self.encode_byte_seq_operand(bytes);
                 Ok(())
             }
 
@@ -423,8 +368,8 @@ impl Assembler {
         }
     }
 
-    fn visit_ast(&mut self) -> Result<(), String> {
-        for node in &self.ast.clone() {
+    fn visit_ast(&mut self, ast: &Ast) -> Result<(), String> {
+        for node in ast {
             self.visit_node(node)?;
         }
         Ok(())
@@ -434,39 +379,20 @@ impl Assembler {
         for node in ast {
             if let Node::Directive(Directive::Define(name, value)) = node {
                 self.consts.insert(name.clone(), *value.clone());
-                println!("assembler: Defined constant {} as {:?}", name, value);
+                crate::debug_log!("assembler: Defined constant {} as {:?}", name, value);
             }
         }
         Ok(())
     }
 
-    // Pass to resolve labels to addresses
-    fn resolve_label_pass(&mut self, ast: &Ast) -> Result<(), String> {
-        for node in ast {
-            if let Node::Label(label) = node {
-                self.labels.insert(label.clone(), self.ptr);
-                println!("assembler: Defined label {} at {:08X}", label, self.ptr);
-            }
-
-            if let Node::Directive(Directive::Rep(count, body)) = node {
-                for _ in 0..*count {
-                    for rep_node in body {
-                        // Process each repeated instruction to calculate the size
-                        // Cut and paste from below
-
-                        if let Node::Instruction(instr, args) = rep_node {
-                            let size = self.calculate_instruction_size(instr, args)?;
-                            self.ptr += size;
-                        }
-                    }
-                }
-            }
-
-            // Count instruction size, and append that much to the ptr
-            if let Node::Instruction(instr, args) = node {
-                let size = self.calculate_instruction_size(instr, args)?;
-                self.ptr += size;
-            }
+    // Patch forward label references now that every label address is known
+    fn resolve_patches(&mut self) -> Result<(), String> {
+        for (offset, label) in std::mem::take(&mut self.patches) {
+            let addr = *self
+                .labels
+                .get(&label)
+                .ok_or(format!("Undefined label or constant: {}", label))?;
+            self.buffer[offset..offset + 4].copy_from_slice(&(addr as u32).to_le_bytes());
         }
         Ok(())
     }
@@ -474,32 +400,28 @@ impl Assembler {
     // --------------------------------------
 
     pub fn assemble(&mut self, ast: &Ast) -> Result<&Vec<u8>, String> {
-        self.ast = ast.clone();
-
-        // First pass: collect and resolve labels (NO buffer writing)
-        println!("assembler: Performing first pass");
         self.ptr = 0;
         self.labels.clear();
+        self.patches.clear();
         self.buffer.clear();
 
-        self.resolve_const_pass(ast)?;
+        let ast = self.expand_includes(ast)?;
 
-        self.resolve_label_pass(ast)?;
+        self.resolve_const_pass(&ast)?;
 
-        println!("assembler: Resolved labels: {:?}", self.labels);
-        println!("assembler: Total bytecode size: {}", self.ptr);
-
-        // Second pass: generate bytecode
-        println!("assembler: Performing second pass");
-        self.ptr = 0; // Reset ptr for second pass
-        self.buffer.clear();
+        // Single pass: emit bytecode directly, learning label addresses as
+        // they appear and back-patching forward references at the end
+        crate::debug_log!("assembler: Performing emission pass");
+        self.visit_ast(&ast)?;
+        self.resolve_patches()?;
 
-        self.visit_ast()?;
+        crate::debug_log!("assembler: Resolved labels: {:?}", self.labels);
+        crate::debug_log!("assembler: Total bytecode size: {}", self.ptr);
 
-        // Copy buffer to output
-        self.output_bc = self.buffer.clone();
+        // Move the finished buffer to output rather than copying it
+        self.output_bc = std::mem::take(&mut self.buffer);
 
-        println!("assembler: Data written: {:02X?}", self.buffer);
+        crate::debug_log!("assembler: Data written: {:02X?}", self.output_bc);
 
         Ok(&self.output_bc)
     }
@@ -4,12 +4,22 @@
 
 use std::iter::Peekable;
 
+// A match lets the compiler bucket mnemonics by length instead of
+// comparing the identifier against every entry of a table
+#[rustfmt::skip]
+fn is_reserved(word: &str) -> bool {
+    matches!(
+        word,
+        "nop" | "push8" | "push16" | "push32" | "pushsz" | "pushac"
+            | "pop8" | "pop16" | "pop32" | "popsz" | "cmp" | "j" | "jeq" | "jne"
+            | "add" | "sub" | "mul" | "div" | "call" | "callnat" | "ret" | "halt"
+    )
+}
+
 #[derive(Debug, Clone)]
 pub struct Lexer<'l> {
     pub src: &'l str,
     pub pos: usize,
-
-    reserved_words: Vec<&'l str>,
 }
 
 #[derive(Debug, Clone)]
@@ -43,40 +53,42 @@ pub enum TokenKind {
 
 impl<'l> Lexer<'l> {
     pub fn new(src: &'l str) -> Self {
-        Lexer {
-            pos: 0,
-            src,
-
-            #[rustfmt::skip]
-            reserved_words: vec![
-                "nop", "push8", "push16", "push32", "pushsz", "pushac",
-                "pop8", "pop16", "pop32", "popsz", "cmp", "j", "jeq", "jne",
-                "add", "sub", "mul", "div", "call", "callnat", "ret", "halt",
-            ],
-        }
+        Lexer { pos: 0, src }
     }
 
     /// Peek at the next character without consuming it.
+    ///
+    /// `pos` is a byte offset, so decoding the next char from the slice is
+    /// O(1); walking `chars().nth(pos)` rescanned the source from the start
+    /// on every peek. Decoding properly (instead of casting single bytes)
+    /// keeps multibyte characters in string literals and identifiers intact.
     fn peek(&self) -> char {
-        self.src.chars().nth(self.pos).unwrap_or('\0')
+        self.src
+            .get(self.pos..)
+            .and_then(|s| s.chars().next())
+            .unwrap_or('\0')
     }
 
     fn peek_ahead(&self, offset: usize) -> char {
-        self.src.chars().nth(self.pos + offset).unwrap_or('\0')
+        self.src
+            .get(self.pos + offset..)
+            .and_then(|s| s.chars().next())
+            .unwrap_or('\0')
     }
 
     // Helper to push a token, without a specific literal value
+    // Nothing downstream reads an operator's literal, so don't format one
     fn push(&mut self, token: TokenKind, tokens: &mut Vec<Token>) {
         tokens.push(Token {
-            kind: token.clone(),
-            literal: format!("{:?}", token),
+            kind: token,
+            literal: String::new(),
         });
     }
 
     /// Peek, advance and return the peeked character.
     fn advance(&mut self) -> char {
         let peeked = self.peek();
-        self.pos += 1;
+        self.pos += peeked.len_utf8();
         peeked
     }
 
@@ -130,7 +142,9 @@ impl<'l> Lexer<'l> {
         }
 
         let int_value = if base != 10 {
-            u32::from_str_radix(value.trim_start_matches(&format!("0{}", basech)), base).unwrap()
+            // The prefix is always exactly "0" + basech, so skip it directly
+            // rather than allocating a pattern string to trim against
+            u32::from_str_radix(&value[2..], base).unwrap()
         } else {
             value.parse().unwrap()
         };
@@ -146,8 +160,10 @@ impl<'l> Lexer<'l> {
 
         self.eat_whitespace();
 
-        while self.peek() != ']' && self.peek() != '\0' {
+        // Peek each character once instead of re-reading it per condition
+        loop {
             match self.peek() {
+                ']' | '\0' => break,
                 ' ' | '\t' => {
                     self.advance();
                 }
@@ -175,16 +191,23 @@ impl<'l> Lexer<'l> {
             panic!("Unterminated byte sequence");
         }
 
+        // The bytes live in the token kind; the literal is never read
         Token {
-            kind: TokenKind::ByteSeq(bytes.clone()),
-            literal: format!("{:?}", bytes),
+            kind: TokenKind::ByteSeq(bytes),
+            literal: String::new(),
         }
     }
 
     fn lex_string(&mut self) -> Token {
         let mut value = String::new();
-        while self.peek() != '"' && self.peek() != '\'' && self.peek() != '\0' {
-            let c = self.advance();
+        // Peek each character once instead of re-reading it per condition
+        loop {
+            let c = self.peek();
+            if c == '"' || c == '\'' || c == '\0' {
+                break;
+            }
+            self.advance();
+
             match c {
                 '\\' => {
                     let c = self.advance();
@@ -221,29 +244,33 @@ impl<'l> Lexer<'l> {
     // Lex things that are *like* identifiers, but may not be
     // This includes reserved words and labels
     fn lex_ident_like(&mut self) -> Token {
-        let mut ident = String::new();
+        // Scan to the end of the identifier and slice it out of the source
+        // in one go, instead of growing a String a character at a time.
+        // advance steps whole chars, keeping the slice on char boundaries
+        let start = self.pos;
         while self.peek().is_alphanumeric() || self.peek() == '_' {
-            ident.push(self.advance());
+            self.advance();
         }
+        let ident = &self.src[start..self.pos];
 
-        if self.reserved_words.contains(&ident.as_str()) {
+        if is_reserved(ident) {
             return Token {
                 kind: TokenKind::Instruction,
-                literal: ident,
+                literal: ident.to_string(),
             };
         }
 
         if self.peek() == ':' {
             self.advance(); // consume ':'
             return Token {
-                kind: TokenKind::Label(ident.clone()),
-                literal: ident,
+                kind: TokenKind::Label(ident.to_string()),
+                literal: ident.to_string(),
             };
         }
 
         Token {
-            kind: TokenKind::Ident(ident.clone()),
-            literal: ident,
+            kind: TokenKind::Ident(ident.to_string()),
+            literal: ident.to_string(),
         }
     }
 
@@ -268,12 +295,12 @@ impl<'l> Lexer<'l> {
 
     fn lex_token(&mut self, tokens: &mut Vec<Token>) {
         loop {
+            // Skip whitespace once per iteration, up front
+            self.eat_whitespace();
+
             let c = self.peek();
             match c {
                 '\0' | '\r' | '\n' => break,
-                ' ' | '\t' => {
-                    self.advance();
-                }
 
                 '/' if self.peek_ahead(1) == '/' => {
                     // Skip line comment
@@ -296,7 +323,7 @@ impl<'l> Lexer<'l> {
                     tokens.push(self.lex_string());
                 }
                 '%' => {
-                    println!("lex_value: reading a directive");
+                    crate::debug_log!("lex_value: reading a directive");
                     tokens.extend(self.lex_directive());
                 }
                 _ if c.is_alphabetic() || c == '_' => {
@@ -306,14 +333,15 @@ impl<'l> Lexer<'l> {
                     self.advance();
                 }
             }
-
-            self.eat_whitespace();
         }
     }
 
     pub fn lex(&mut self) -> Peekable<impl Iterator<Item = Token>> {
         let mut tokens = Vec::new();
         loop {
+            // Skip whitespace once per iteration, up front
+            self.eat_whitespace();
+
             let c = self.peek();
             match c {
                 '\0' => break,
@@ -323,10 +351,6 @@ impl<'l> Lexer<'l> {
                         self.advance();
                     }
                 }
-                ' ' | '\t' | '\r' | '\n' => {
-                    self.advance();
-                    self.eat_whitespace();
-                }
 
                 // Operators
                 '+' => {
@@ -375,7 +399,7 @@ impl<'l> Lexer<'l> {
                     tokens.push(self.lex_string());
                 }
                 '%' => {
-                    println!("lex_value: reading a directive");
+                    crate::debug_log!("lex_value: reading a directive");
                     tokens.extend(self.lex_directive());
                 }
 
@@ -387,8 +411,6 @@ impl<'l> Lexer<'l> {
                     self.advance();
                 }
             }
-
-            self.eat_whitespace();
         }
 
         // Return an iterator over the collected tokens
@@ -436,6 +458,16 @@ mod tests {
         assert!(matches!(byte_seq.kind, TokenKind::ByteSeq(_)));
     }
 
+    #[test]
+    fn lex_string_utf8() {
+        let mut lex = make_lexer("\"héllo\"");
+        let mut tokens = lex.lex();
+
+        let s = tokens.next().unwrap();
+        assert_eq!(s.kind, TokenKind::String);
+        assert_eq!(s.literal, "héllo");
+    }
+
     #[test]
     fn lex_string() {
         let mut lex = make_lexer("\"hello\" 'world'");
@@ -450,6 +482,15 @@ mod tests {
         assert_eq!(single_quoted.literal, "world");
     }
 
+    #[test]
+    fn lex_utf8_label() {
+        let mut lex = make_lexer("lébel:\n  nop");
+        let mut tokens = lex.lex();
+
+        let label = tokens.next().unwrap();
+        assert_eq!(label.kind, TokenKind::Label("lébel".to_string()));
+    }
+
     #[test]
     fn lex_directive() {
         let mut lex = make_lexer("%include 'foobar'");
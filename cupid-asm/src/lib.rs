@@ -2,6 +2,18 @@ pub mod assembler;
 pub mod lexer;
 pub mod parser;
 
+/// Diagnostic output for the lexer/parser/assembler hot paths.
+/// Compiled down to nothing in release builds so assembling large
+/// sources is not dominated by stdout writes.
+#[macro_export]
+macro_rules! debug_log {
+    ($($arg:tt)*) => {
+        if cfg!(debug_assertions) {
+            println!($($arg)*);
+        }
+    };
+}
+
 #[repr(u8)]
 #[derive(Debug, Clone, Copy, PartialEq, Eq)]
 #[allow(non_camel_case_types)]
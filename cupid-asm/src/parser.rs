@@ -159,7 +159,7 @@ where
     fn parse_args(&mut self) -> ParseResult<Vec<Node>> {
         let mut args = Vec::new();
         while let Some(token) = self.tokens.peek() {
-            println!("got a {:?}", token.kind);
+            crate::debug_log!("got a {:?}", token.kind);
 
             match token.kind {
                 TokenKind::Ident(ref name) => {
@@ -219,7 +219,7 @@ where
                     "halt" => Ok(Node::Instruction(Instr::HALT, args)),
 
                     _ => {
-                        println!("parse_instruction: {}", instr);
+                        crate::debug_log!("parse_instruction: {}", instr);
 
                         Err(ParseError::InvalidInstruction {
                             name: instr,
@@ -445,7 +445,7 @@ where
         let token = self.tokens.next().ok_or(ParseError::UnexpectedEof)?;
         match token.kind {
             TokenKind::Directive(ref name) => {
-                println!("parser: Parsing directive {}", name);
+                crate::debug_log!("parser: Parsing directive {}", name);
 
                 let has_parens =
                     matches!(self.tokens.peek(), Some(t) if t.kind == TokenKind::LParen);
@@ -455,7 +455,7 @@ where
                 }
 
                 let args = self.parse_args()?;
-                println!("parser: Parsed directive arguments {:?}", args);
+                crate::debug_log!("parser: Parsed directive arguments {:?}", args);
 
                 if has_parens {
                     self.expect(TokenKind::RParen)?; // expect ')'
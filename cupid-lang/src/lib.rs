@@ -1 +1,13 @@
 pub mod runtime;
+
+/// Diagnostic output for the VM execution loop.
+/// Compiled down to nothing in release builds so running bytecode is not
+/// dominated by stdout writes.
+#[macro_export]
+macro_rules! debug_log {
+    ($($arg:tt)*) => {
+        if cfg!(debug_assertions) {
+            println!($($arg)*);
+        }
+    };
+}
@@ -104,8 +104,12 @@ pub fn dump_memory(vm: &VM, start: usize, end: usize) {
     let end = end.min(vm.program.len());
     let mut addr = start;
 
+    // Accumulate the whole dump and write it once, instead of paying a
+    // stdout write per line
+    let mut out = String::new();
+
     while addr < end {
-        print!("{:04X}: ", addr);
+        out.push_str(&format!("{:04X}: ", addr));
 
         let mut line_content = String::new();
         let mut bytes_on_line = 0;
@@ -145,8 +149,11 @@ pub fn dump_memory(vm: &VM, start: usize, end: usize) {
             bytes_on_line += size;
         }
 
-        println!("{}", line_content.trim_end());
+        out.push_str(line_content.trim_end());
+        out.push('\n');
     }
+
+    print!("{}", out);
 }
 
 pub fn dump_stack_val(vm_value: &VMValue) -> String {
@@ -158,8 +165,9 @@ pub fn dump_stack_val(vm_value: &VMValue) -> String {
 }
 
 pub fn dump_stack(vm: &VM) {
-    println!("Stack (sp={}):", vm.sp);
+    let mut out = format!("Stack (sp={}):\n", vm.sp);
     for (i, val) in vm.stack.iter().enumerate() {
-        println!("  [{}]: {}", i, dump_stack_val(val));
+        out.push_str(&format!("  [{}]: {}\n", i, dump_stack_val(val)));
     }
+    print!("{}", out);
 }
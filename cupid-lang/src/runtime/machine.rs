@@ -29,7 +29,7 @@ macro_rules! decode {
             $self.program[($ip as usize) + 1],
             $self.program[($ip as usize) + 2],
         ];
-        let val = (bytes[0] as u32) | ((bytes[1] as u32) << 8);
+        let val = u16::from_le_bytes(bytes) as u32;
         (vec![val], $ip + 3)
     }};
 
@@ -56,7 +56,7 @@ macro_rules! decode {
             $self.program[($ip as usize) + 3],
             $self.program[($ip as usize) + 4],
         ];
-        (vec![construct_dword!(bytes)], $ip + 5)
+        (vec![u32::from_le_bytes(bytes)], $ip + 5)
     }};
 
     ($self:expr, $ip:expr, addr) => {{
@@ -66,7 +66,7 @@ macro_rules! decode {
             $self.program[($ip as usize) + 3],
             $self.program[($ip as usize) + 4],
         ];
-        (vec![construct_dword!(bytes)], $ip + 5)
+        (vec![u32::from_le_bytes(bytes)], $ip + 5)
     }};
 }
 
@@ -212,8 +212,12 @@ impl VM {
     fn fetch_decode(&mut self) -> VMOp {
         // Determine the number of operands and read that many
         let opcode = self.program[self.ip as usize];
-        println!("fetch_decode: called for {:02X}", opcode);
-        let (operands, next_ip) = match opcode.try_into().unwrap() {
+        crate::debug_log!("fetch_decode: called for {:02X}", opcode);
+
+        // Decode the opcode once and reuse it for both the operand match
+        // and the VMOp we hand to execute
+        let op: Op = opcode.try_into().unwrap();
+        let (operands, next_ip) = match op {
             Op::NOP | Op::HALT => decode!(self, self.ip, no_ops),
 
             Op::PUSH8 => decode!(self, self.ip, byte),
@@ -237,23 +241,23 @@ impl VM {
             Op::CALL => decode!(self, self.ip, addr),
             Op::CALL_NAT => decode!(self, self.ip, addr),
             Op::RET => decode!(self, self.ip, no_ops),
-
-            _ => panic!("Unimplemented opcode in fetch_decode: {:02X}", opcode),
         };
 
         self.next_ip = next_ip;
 
         VMOp {
-            opcode: opcode.try_into().unwrap(),
+            opcode: op,
             operands: operands.into(),
         }
     }
 
     fn call_function(&mut self, func: u32) {
         // Call a function by pushing a new call frame
+        // ip has already been stepped past the call instruction, so it is
+        // exactly the address to return to
         let frame = CallFrame {
             function_id: func,
-            return_address: self.ip + 2,
+            return_address: self.ip,
             base_ptr: self.bp,
         };
 
@@ -459,8 +463,6 @@ impl VM {
 
             _ => todo!("Unimplemented opcode: {:?}", mach_op.opcode),
         }
-
-        self.dump_ctx();
     }
 
     pub fn dump_ctx(&self) {
@@ -476,31 +478,14 @@ impl VM {
     }
 
     pub fn cycle(&mut self) {
-        let opcode = self.program[self.ip as usize];
         let mach_op = self.fetch_decode();
 
-        self.execute(mach_op);
-
-        match opcode {
-            0x02 => {
-                // Step past the entire instruction including null terminator
-                let mut i = 1;
-                while (self.ip as usize + i) < self.program.len()
-                    && self.program[self.ip as usize + i] != 0
-                {
-                    i += 1;
-                }
-                self.ip += i as u32 + 1; // +1 for null terminator
-            }
-
-            0x08 | 0x09 | 0x0A | 0x0B | 0x10 | 0x12 => {
-                // These opcodes modify ip directly, so we don't step here
-            }
+        // Step past the instruction using the exact size fetch_decode
+        // already computed from the operand encoding; jumps, calls and
+        // returns overwrite ip inside execute
+        self.ip = self.next_ip;
 
-            _ => {
-                self.ip = self.next_ip;
-            }
-        }
+        self.execute(mach_op);
     }
 
     pub fn step(&mut self, size: u32) {
@@ -520,7 +505,12 @@ impl VM {
             }
 
             self.cycle();
-            self.dump_ctx();
+
+            // Dumping the whole machine context every cycle is only
+            // affordable (or useful) when debugging
+            if cfg!(debug_assertions) {
+                self.dump_ctx();
+            }
 
             // Safety break to prevent infinite loops
             if self.ip > 1000 {
@@ -531,9 +521,7 @@ impl VM {
     }
 
     pub fn run_with(&mut self, code: &[u8]) {
-        for i in 0..code.len() {
-            self.program.push(code[i]);
-        }
+        self.program.extend_from_slice(code);
 
         self.run();
     }